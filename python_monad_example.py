@@ -248,19 +248,21 @@ class ThinkingSpaceApp:
     
     def setup_ai(self) -> AIMonad:
         """Setup AI integration"""
-        return (
+        ai = (
             AIMonad({})
             .init_gemini(self.api_key)
             .pipe(lambda ai: {**ai, 'ready': True})
         )
+        return AIMonad(ai.value, self.api_key)
     
     def setup_visualization(self) -> VisualizationMonad:
         """Setup 3D visualization"""
-        return (
+        viz = (
             VisualizationMonad({})
             .init_scene()
             .pipe(lambda viz: {**viz, 'ready': True})
         )
+        return VisualizationMonad(viz.value)
     
     def search_photos(self, query: str) -> Monad:
         """Complete photo search pipeline"""
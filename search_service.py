@@ -0,0 +1,538 @@
+"""
+Async Search Service for Thinking Space App
+Stdlib-only HTTP/JSON front end around ThinkingSpaceApp.search_photos
+
+Each worker process owns one shared app context (app + result cache),
+requests go through a bounded queue (backpressure) and concurrent
+queries are micro-batched before hitting the search pipeline.
+
+/health and /metrics are answered by whichever worker accepted the
+connection, so every number they report is per worker: `pid` tells
+which worker answered and `workers` how many share the port.
+
+    python search_service.py --port 8080 --workers 4
+    curl 'http://127.0.0.1:8080/search?q=winter+landscapes'
+    curl http://127.0.0.1:8080/health
+    curl http://127.0.0.1:8080/metrics
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+import traceback
+
+from python_monad_example import ThinkingSpaceApp
+
+# Configuration
+@dataclass
+class ServiceConfig:
+    host: str = '127.0.0.1'
+    port: int = 8080
+    workers: int = 1
+    queue_size: int = 1024
+    batch_size: int = 32
+    batch_window: float = 0.005  # seconds to wait for a batch to fill
+    cache_size: int = 1024
+    request_timeout: float = 10.0  # seconds a query may wait for its batch
+    keep_alive_timeout: float = 5.0  # seconds an idle connection may wait for its next request
+    api_key: str = os.environ.get('GEMINI_API_KEY', 'mock-api-key')
+
+# Metrics
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed millisecond buckets"""
+
+    BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000.0
+        self.count += 1
+        self.total_ms += ms
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {}
+        running = 0
+        for bound, count in zip(self.BUCKETS_MS, self.counts):
+            running += count
+            buckets[f'le_{bound}ms'] = running
+        buckets['le_inf'] = running + self.counts[-1]
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'buckets': buckets
+        }
+
+class ServiceMetrics:
+    """Per-worker counters and histograms (not aggregated across the pool)"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.request_latency = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+        self.batch_latency = LatencyHistogram()
+
+    def snapshot(self, queue_depth: int, queue_size: int, workers: int) -> Dict[str, Any]:
+        return {
+            'scope': 'worker',
+            'pid': os.getpid(),
+            'workers': workers,
+            'uptime_s': round(time.time() - self.started_at, 3),
+            'queue_depth': queue_depth,
+            'queue_size': queue_size,
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'cache_hits': self.cache_hits,
+            'batches': self.batches,
+            'avg_batch_size': round(self.batched_queries / self.batches, 3) if self.batches else 0.0,
+            'request_latency': self.request_latency.snapshot(),
+            'queue_wait': self.queue_wait.snapshot(),
+            'batch_latency': self.batch_latency.snapshot()
+        }
+
+# Shared App Context
+def public_result(result: Dict) -> Dict:
+    """Drop fields that must never leave the service (the AI state carries the API key)"""
+    ai = {key: value for key, value in result.get('ai', {}).items() if key != 'api_key'}
+    return {**result, 'ai': ai}
+
+class QueueFullError(Exception):
+    """Raised when the request queue is at capacity"""
+
+class BatcherStoppedError(Exception):
+    """Raised when the worker's batcher task is no longer running"""
+
+class SearchContext:
+    """One ThinkingSpaceApp, result cache and micro-batcher per worker"""
+
+    def __init__(self, config: ServiceConfig):
+        self.config = config
+        self.app = ThinkingSpaceApp(api_key=config.api_key)
+        self.cache: 'OrderedDict[str, Dict]' = OrderedDict()
+        self.metrics = ServiceMetrics()
+        self.queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.config.queue_size)
+        self._batcher = asyncio.get_running_loop().create_task(self._run_batches())
+
+    async def stop(self) -> None:
+        if self._batcher:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def healthy(self) -> bool:
+        return self._batcher is not None and not self._batcher.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+    async def search(self, query: str) -> Dict:
+        """Enqueue a query and wait for its batched result"""
+        cached = self._cache_get(query)
+        if cached is not None:
+            self.metrics.cache_hits += 1
+            return cached
+        if not self.healthy:
+            raise BatcherStoppedError('batcher stopped')
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((query, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"queue full ({self.config.queue_size})")
+        return await asyncio.wait_for(future, self.config.request_timeout)
+
+    def _cache_get(self, query: str) -> Optional[Dict]:
+        if query in self.cache:
+            self.cache.move_to_end(query)
+            return self.cache[query]
+        return None
+
+    def _cache_put(self, query: str, result: Dict) -> None:
+        self.cache[query] = result
+        self.cache.move_to_end(query)
+        while len(self.cache) > self.config.cache_size:
+            self.cache.popitem(last=False)
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future, float]]:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.config.batch_window
+        while len(batch) < self.config.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _search_many(self, queries: List[str]) -> Dict[str, Any]:
+        """Run the search pipeline once per distinct query (executor thread)"""
+        results = {}
+        for query in queries:
+            try:
+                monad = self.app.search_photos(query)
+                results[query] = monad if monad.error else monad.get()
+            except Exception as e:
+                results[query] = e
+        return results
+
+    async def _run_batches(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            try:
+                await self._process_batch(batch)
+            except Exception as e:
+                # Keep the batcher alive; only this batch fails
+                traceback.print_exc()
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _process_batch(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        loop = asyncio.get_running_loop()
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            self.metrics.queue_wait.observe(now - enqueued_at)
+
+        queries = list(dict.fromkeys(query for query, _, _ in batch))
+        started = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(None, self._search_many, queries)
+        except Exception as e:
+            results = {query: e for query in queries}
+        self.metrics.batches += 1
+        self.metrics.batched_queries += len(batch)
+        self.metrics.batch_latency.observe(time.perf_counter() - started)
+
+        for query, future, _ in batch:
+            if future.done():
+                continue
+            result = results[query]
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            elif getattr(result, 'error', None):
+                future.set_exception(Exception(result.error))
+            else:
+                result = public_result(result)
+                self._cache_put(query, result)
+                future.set_result(result)
+
+# HTTP Handling
+class HTTPError(Exception):
+    """Request that cannot be parsed; answered with `status` and the connection closed"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error', 501: 'Not Implemented',
+    503: 'Service Unavailable', 504: 'Gateway Timeout'
+}
+MAX_BODY = 64 * 1024
+MAX_HEADERS = 100
+
+async def write_json(writer: asyncio.StreamWriter, status: int, payload: Any,
+                     keep_alive: bool) -> None:
+    body = json.dumps(payload).encode('utf-8')
+    headers = [
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+        'Content-Type: application/json',
+        f'Content-Length: {len(body)}',
+        f"Connection: {'keep-alive' if keep_alive else 'close'}"
+    ]
+    if status == 503:
+        headers.append('Retry-After: 1')
+    writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+async def read_line(reader: asyncio.StreamReader) -> bytes:
+    """readline() that answers over-long lines (> stream limit) with 431"""
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HTTPError(431, 'request line or header too long')
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+    """Parse one HTTP/1.1 request; None when the client closed the connection"""
+    request_line = await read_line(reader)
+    if not request_line.strip():
+        return None
+    try:
+        method, target, version = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, 'malformed request line')
+    headers = {}
+    while True:
+        line = await read_line(reader)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(431, f'more than {MAX_HEADERS} header lines')
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'transfer-encoding' in headers:
+        raise HTTPError(501, 'Transfer-Encoding is not supported; send Content-Length')
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, 'invalid Content-Length')
+    if length < 0:
+        raise HTTPError(400, 'invalid Content-Length')
+    if length > MAX_BODY:
+        raise HTTPError(413, 'payload too large')
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, version.strip().upper(), headers, body
+
+async def route(ctx: SearchContext, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+    url = urlsplit(target)
+    if url.path == '/health':
+        return (200 if ctx.healthy else 503), {
+            'status': 'ok' if ctx.healthy else 'batcher stopped',
+            'scope': 'worker',
+            'pid': os.getpid(),
+            'workers': ctx.config.workers,
+            'queue_depth': ctx.queue_depth
+        }
+    if url.path == '/metrics':
+        return 200, ctx.metrics.snapshot(ctx.queue_depth, ctx.config.queue_size, ctx.config.workers)
+    if url.path != '/search':
+        return 404, {'error': f'no route for {url.path}'}
+
+    if method == 'GET':
+        query = parse_qs(url.query).get('q', [''])[0]
+    elif method == 'POST':
+        try:
+            query = json.loads(body or b'{}').get('query', '')
+        except (ValueError, AttributeError):
+            return 400, {'error': 'body must be a JSON object'}
+    else:
+        return 405, {'error': f'{method} not allowed'}
+    if not isinstance(query, str) or not query.strip():
+        return 400, {'error': 'missing query'}
+
+    try:
+        return 200, await ctx.search(query.strip())
+    except QueueFullError as e:
+        ctx.metrics.rejected += 1
+        return 503, {'error': str(e)}
+    except BatcherStoppedError as e:
+        ctx.metrics.errors += 1
+        return 503, {'error': str(e)}
+    except asyncio.TimeoutError:
+        ctx.metrics.errors += 1
+        return 504, {'error': f'search timed out after {ctx.config.request_timeout}s'}
+    except Exception as e:
+        ctx.metrics.errors += 1
+        return 500, {'error': str(e)}
+
+async def linger(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Half-close and discard unread input so closing does not reset the error response"""
+    try:
+        if writer.can_write_eof():
+            writer.write_eof()
+        async def _discard():
+            while await reader.read(MAX_BODY):
+                pass
+        await asyncio.wait_for(_discard(), 1.0)
+    except (ValueError, ConnectionError, asyncio.TimeoutError):
+        pass
+
+async def handle_connection(ctx: SearchContext, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(read_request(reader),
+                                                 ctx.config.keep_alive_timeout)
+            except asyncio.TimeoutError:
+                break
+            except HTTPError as e:
+                await write_json(writer, e.status, {'error': str(e)}, keep_alive=False)
+                await linger(reader, writer)
+                break
+            if request is None:
+                break
+            method, target, version, headers, body = request
+            started = time.perf_counter()
+            status, payload = await route(ctx, method, target, body)
+            ctx.metrics.requests += 1
+            ctx.metrics.request_latency.observe(time.perf_counter() - started)
+            connection = headers.get('connection', '').lower()
+            if connection in ('close', 'keep-alive'):
+                keep_alive = connection == 'keep-alive'
+            else:
+                keep_alive = version == 'HTTP/1.1'
+            await write_json(writer, status, payload, keep_alive)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+# Worker and Pre-fork Supervisor
+async def serve(config: ServiceConfig, sock: socket.socket,
+                stop: Optional[asyncio.Future] = None) -> None:
+    """Run one worker: shared context + asyncio server on an inherited socket
+
+    Stops on SIGTERM/SIGINT, or when `stop` resolves if one is given.
+    """
+    ctx = SearchContext(config)
+    ctx.start()
+    connections = set()
+
+    async def _handle(reader, writer):
+        connections.add(writer)
+        try:
+            await handle_connection(ctx, reader, writer)
+        finally:
+            connections.discard(writer)
+
+    server = await asyncio.start_server(_handle, sock=sock)
+    if stop is None:
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+    try:
+        await stop
+    finally:
+        # Close idle keep-alive connections too, otherwise wait_closed() (3.12.1+) blocks
+        server.close()
+        for writer in list(connections):
+            writer.close()
+        await server.wait_closed()
+        await ctx.stop()
+
+def bind_socket(config: ServiceConfig) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((config.host, config.port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+def spawn_worker(config: ServiceConfig, sock: socket.socket) -> int:
+    """Fork one worker; the child exits non-zero if serve() raises"""
+    # Block shutdown signals across fork() so the child never runs the parent's handler
+    shutdown_signals = {signal.SIGTERM, signal.SIGINT}
+    signal.pthread_sigmask(signal.SIG_BLOCK, shutdown_signals)
+    try:
+        pid = os.fork()
+    except BaseException:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, shutdown_signals)
+        raise
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, shutdown_signals)
+        try:
+            asyncio.run(serve(config, sock))
+        except BaseException:
+            traceback.print_exc()
+            os._exit(1)
+        os._exit(0)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, shutdown_signals)
+    return pid
+
+def run(config: ServiceConfig) -> None:
+    """Bind once, fork `workers` processes sharing the socket and respawn any that die"""
+    sock = bind_socket(config)
+    print(f"Search service on http://{sock.getsockname()[0]}:{sock.getsockname()[1]} "
+          f"({config.workers} worker(s))", flush=True)
+    if config.workers <= 1 or not hasattr(os, 'fork'):
+        asyncio.run(serve(config, sock))
+        return
+
+    children: Dict[int, float] = {}
+    for _ in range(config.workers):
+        children[spawn_worker(config, sock)] = time.monotonic()
+    stopping = False
+
+    def _shutdown(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        print(f"Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}; respawning",
+              flush=True)
+        if time.monotonic() - started < 1.0:
+            time.sleep(1.0)  # avoid a tight crash loop
+        if not stopping:
+            children[spawn_worker(config, sock)] = time.monotonic()
+    sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Thinking Space search service')
+    defaults = ServiceConfig()
+    parser.add_argument('--host', default=defaults.host)
+    parser.add_argument('--port', type=int, default=defaults.port)
+    parser.add_argument('--workers', type=int, default=defaults.workers)
+    parser.add_argument('--queue-size', type=int, default=defaults.queue_size)
+    parser.add_argument('--batch-size', type=int, default=defaults.batch_size)
+    parser.add_argument('--batch-window', type=float, default=defaults.batch_window)
+    parser.add_argument('--cache-size', type=int, default=defaults.cache_size)
+    parser.add_argument('--request-timeout', type=float, default=defaults.request_timeout)
+    parser.add_argument('--keep-alive-timeout', type=float, default=defaults.keep_alive_timeout)
+    args = parser.parse_args()
+    run(ServiceConfig(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        batch_window=args.batch_window,
+        cache_size=args.cache_size,
+        request_timeout=args.request_timeout,
+        keep_alive_timeout=args.keep_alive_timeout
+    ))
+
+if __name__ == "__main__":
+    main()
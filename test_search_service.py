@@ -0,0 +1,216 @@
+"""
+Tests for the async search service (mock AI path, localhost only)
+
+    python -m unittest test_search_service
+"""
+
+import asyncio
+import json
+import time
+import unittest
+from unittest import mock
+
+from python_monad_example import ThinkingSpaceApp
+from search_service import SearchContext, ServiceConfig, bind_socket, serve
+
+async def http(port, method, path, body=None, headers=None, version='HTTP/1.1'):
+    """Send one request and read until the server closes; returns (status, headers, json)"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = [f'{method} {path} {version}', 'Host: localhost', 'Connection: close']
+    lines += [f'{k}: {v}' for k, v in (headers or {}).items()]
+    payload = body.encode('utf-8') if body is not None else b''
+    if body is not None:
+        lines.append(f'Content-Length: {len(payload)}')
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+    await writer.drain()
+    raw = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    head, _, data = raw.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    response_headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    return int(status_line.split(' ')[1]), response_headers, json.loads(data)
+
+def slow_search(delay):
+    original = ThinkingSpaceApp.search_photos
+
+    def _search(self, query):
+        time.sleep(delay)
+        return original(self, query)
+    return _search
+
+class ThinkingSpaceAppTest(unittest.TestCase):
+    def test_search_photos_pipeline(self):
+        result = ThinkingSpaceApp('k').search_photos('x').get()
+        self.assertEqual(result['query'], 'x')
+        self.assertEqual(result['ai']['last_query'], 'x')
+        self.assertEqual(len(result['visualization']['photo_nodes']), 3)
+
+class SearchServiceTest(unittest.IsolatedAsyncioTestCase):
+    async def start(self, **overrides) -> int:
+        config = ServiceConfig(port=0, **overrides)
+        sock = bind_socket(config)
+        stop = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(serve(config, sock, stop))
+        self.stop, self.task = stop, task
+
+        async def _stop():
+            if not stop.done():
+                stop.set_result(None)
+            await task
+            sock.close()
+        self.addAsyncCleanup(_stop)
+        await asyncio.sleep(0)
+        return sock.getsockname()[1]
+
+    async def test_search_get_and_post(self):
+        port = await self.start()
+        status, _, body = await http(port, 'GET', '/search?q=winter+landscapes')
+        self.assertEqual(status, 200)
+        self.assertEqual(body['query'], 'winter landscapes')
+        status, _, body = await http(port, 'POST', '/search', json.dumps({'query': 'snow'}))
+        self.assertEqual(status, 200)
+        self.assertEqual(body['state']['photos'][0]['title'], 'snow photo 1')
+
+    async def test_search_response_omits_api_key(self):
+        port = await self.start(api_key='sk-SECRET')
+        status, _, body = await http(port, 'GET', '/search?q=x')
+        self.assertEqual(status, 200)
+        self.assertTrue(body['ai']['ready'])
+        self.assertNotIn('api_key', body['ai'])
+        self.assertNotIn('sk-SECRET', json.dumps(body))
+
+    async def test_bad_requests(self):
+        port = await self.start()
+        self.assertEqual((await http(port, 'POST', '/search', 'not json'))[0], 400)
+        self.assertEqual((await http(port, 'GET', '/search'))[0], 400)
+        self.assertEqual((await http(port, 'GET', '/nope'))[0], 404)
+        status, headers, _ = await http(port, 'POST', '/search',
+                                        headers={'Transfer-Encoding': 'chunked'})
+        self.assertEqual(status, 501)
+        self.assertEqual(headers['connection'], 'close')
+
+    async def test_invalid_content_length(self):
+        port = await self.start()
+        for length, expected in (('-5', 400), ('abc', 400), (str(1024 * 1024), 413)):
+            status, headers, _ = await http(port, 'POST', '/search',
+                                            headers={'Content-Length': length})
+            self.assertEqual(status, expected)
+            self.assertEqual(headers['connection'], 'close')
+
+    async def test_oversized_headers(self):
+        port = await self.start()
+        status, headers, _ = await http(port, 'GET', '/health',
+                                        headers={'X-Long': 'a' * (128 * 1024)})
+        self.assertEqual(status, 431)
+        self.assertEqual(headers['connection'], 'close')
+        many = {f'X-Header-{i}': 'v' for i in range(200)}
+        self.assertEqual((await http(port, 'GET', '/health', headers=many))[0], 431)
+
+    async def test_http10_closes_connection(self):
+        port = await self.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /health HTTP/1.0\r\n\r\n')
+        raw = await asyncio.wait_for(reader.read(), 2)
+        writer.close()
+        self.assertIn(b'Connection: close', raw)
+
+    async def test_idle_keep_alive_connection_times_out(self):
+        port = await self.start(keep_alive_timeout=0.1)
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        self.assertEqual(await asyncio.wait_for(reader.read(), 2), b'')
+        writer.close()
+
+    async def test_serve_returns_with_idle_keep_alive_client(self):
+        port = await self.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 2)
+        self.assertIn(b'Connection: keep-alive', head)
+        self.stop.set_result(None)
+        await asyncio.wait_for(self.task, 1)
+        writer.close()
+
+    async def test_full_queue_returns_503(self):
+        with mock.patch.object(ThinkingSpaceApp, 'search_photos', slow_search(0.2)):
+            port = await self.start(queue_size=1, batch_size=1)
+            responses = await asyncio.gather(
+                *[http(port, 'GET', f'/search?q=q{i}') for i in range(6)]
+            )
+        rejected = [headers for status, headers, _ in responses if status == 503]
+        self.assertTrue(rejected)
+        self.assertEqual(rejected[0]['retry-after'], '1')
+
+    async def test_timeout_returns_504(self):
+        with mock.patch.object(ThinkingSpaceApp, 'search_photos', slow_search(0.3)):
+            port = await self.start(request_timeout=0.05)
+            status, _, _ = await http(port, 'GET', '/search?q=slow')
+        self.assertEqual(status, 504)
+
+    async def test_failing_query_does_not_fail_batch(self):
+        original = ThinkingSpaceApp.search_photos
+
+        def _search(self, query):
+            if query == 'boom':
+                raise RuntimeError('boom')
+            return original(self, query)
+        with mock.patch.object(ThinkingSpaceApp, 'search_photos', _search):
+            port = await self.start(batch_window=0.05)
+            (ok, _, _), (failed, _, _) = await asyncio.gather(
+                http(port, 'GET', '/search?q=fine'), http(port, 'GET', '/search?q=boom')
+            )
+        self.assertEqual((ok, failed), (200, 500))
+
+    async def test_duplicate_queries_searched_once(self):
+        with mock.patch.object(ThinkingSpaceApp, 'search_photos', autospec=True,
+                               side_effect=ThinkingSpaceApp.search_photos) as search:
+            port = await self.start(batch_window=0.05)
+            responses = await asyncio.gather(
+                *[http(port, 'GET', '/search?q=same') for _ in range(5)]
+            )
+        self.assertEqual([status for status, _, _ in responses], [200] * 5)
+        self.assertEqual(search.call_count, 1)
+
+    async def test_metrics_histograms_count_requests(self):
+        port = await self.start()
+        _, _, before = await http(port, 'GET', '/metrics')
+        await http(port, 'GET', '/search?q=metrics')
+        _, _, after = await http(port, 'GET', '/metrics')
+        self.assertEqual(after['scope'], 'worker')
+        self.assertEqual(after['workers'], 1)
+        self.assertGreater(after['request_latency']['count'], before['request_latency']['count'])
+        self.assertGreater(after['request_latency']['buckets']['le_inf'],
+                           before['request_latency']['buckets']['le_inf'])
+        self.assertEqual(after['batch_latency']['count'], 1)
+        self.assertEqual(after['queue_wait']['count'], 1)
+
+    async def test_health_fails_when_batcher_stops(self):
+        port = await self.start()
+        self.assertEqual((await http(port, 'GET', '/health'))[0], 200)
+
+        async def _dead(self):
+            return None
+        with mock.patch.object(SearchContext, '_run_batches', _dead):
+            port = await self.start()
+            await asyncio.sleep(0.01)
+            status, _, body = await http(port, 'GET', '/health')
+            self.assertEqual(status, 503)
+            self.assertEqual(body['status'], 'batcher stopped')
+            started = time.perf_counter()
+            status, headers, _ = await http(port, 'GET', '/search?q=x')
+        self.assertEqual(status, 503)
+        self.assertEqual(headers['retry-after'], '1')
+        self.assertLess(time.perf_counter() - started, 1)
+
+    async def test_batcher_survives_unexpected_error(self):
+        port = await self.start()
+        with mock.patch.object(SearchContext, '_cache_put', side_effect=KeyError('boom')), \
+                mock.patch('traceback.print_exc'):
+            self.assertEqual((await http(port, 'GET', '/search?q=first'))[0], 500)
+        self.assertEqual((await http(port, 'GET', '/health'))[0], 200)
+        self.assertEqual((await http(port, 'GET', '/search?q=second'))[0], 200)
+
+if __name__ == "__main__":
+    unittest.main()